@@ -1,7 +1,9 @@
-from . import ast, grammar, parser, util
+from . import ast, cache, compiled, grammar, parser, util
 
 from .core import *
 from .builtin import *
+from .cache import *
+from .compiled import *
 from .errors import *
 from .util import *
 
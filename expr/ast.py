@@ -1,19 +1,31 @@
 import math
+import operator
 
+from abc import ABCMeta, ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
 from decimal import Decimal
 from rply.token import BaseBox
-from abc import ABC, abstractmethod
-from typing import Generic, Tuple, TypeVar
+from typing import Any, Callable, Generic, Hashable, Iterator, MutableMapping, Sequence, Tuple, TypeVar
+from weakref import WeakValueDictionary
 
-from .errors import CastingError
+from .builtin import is_impure
+from .errors import CastingError, UnknownPointer
 from .util import cast
 
 
 ET: TypeVar = TypeVar('NT', bound=Decimal)
 
 __all__: Tuple[str, ...] = (
+    'NodeMeta',
+    'NodeTable',
+    'interning',
     'Token',
     'Number',
+    'Name',
+    'Call',
+    'Aggregate',
+    'Assign',
     'Operator',
     'Add',
     'Sub',
@@ -22,15 +34,62 @@ __all__: Tuple[str, ...] = (
     'Mod',
     'FloorDiv',
     'Pow',
+    'Neg',
     'Factorial'
 )
 
+NodeTable = WeakValueDictionary
 
-class Token(ABC, BaseBox, Generic[ET]):
+_shared_table: NodeTable = NodeTable()
+_intern_table: ContextVar = ContextVar('_intern_table', default=None)
+
+
+@contextmanager
+def interning(table: MutableMapping[Hashable, 'Token'] = None, /) -> Iterator[MutableMapping[Hashable, 'Token']]:
+    """
+    Hash-conses every node constructed inside of this context,
+    so that structurally identical subtrees are the same object.
+
+    If no table is given, a table shared by the whole process is used.
+    """
+    table = _shared_table if table is None else table
+    reset = _intern_table.set(table)
+
+    try:
+        yield table
+    finally:
+        _intern_table.reset(reset)
+
+
+class NodeMeta(ABCMeta):
+    def __call__(cls, *args, **kwargs) -> Any:
+        node = super().__call__(*args, **kwargs)
+        table = _intern_table.get()
+
+        if table is None:
+            return node
+
+        key = cls, node.signature, *map(id, node.children)
+        try:
+            return table[key]
+        except KeyError:
+            table[key] = node
+            return node
+
+
+class Token(ABC, BaseBox, Generic[ET], metaclass=NodeMeta):
     @abstractmethod
     def eval(self, /) -> ET:
         raise NotImplementedError
 
+    @property
+    def children(self, /) -> Tuple['Token[ET]', ...]:
+        return ()
+
+    @property
+    def signature(self, /) -> Hashable:
+        return None
+
 
 class Number(Token):
     __slots__ = '_value',
@@ -42,54 +101,192 @@ class Number(Token):
         else:
             self._value: ET = _casted
 
+    @property
+    def signature(self, /) -> Hashable:
+        return type(self._value), str(self._value)
+
     def eval(self, /) -> ET:
         return self._value
 
 
+class Name(Token):
+    __slots__ = '_name',
+
+    def __init__(self, name: str, /) -> None:
+        self._name: str = name
+
+    @property
+    def name(self, /) -> str:
+        return self._name
+
+    @property
+    def signature(self, /) -> Hashable:
+        return self._name
+
+    def eval(self, /) -> ET:
+        # Names are only resolved against bindings by compiled expressions
+        raise UnknownPointer(self._name)
+
+
+class Call(Token):
+    __slots__ = '_name', '_func', '_arg'
+
+    def __init__(self, name: str, func: Callable[[ET], ET], arg: Token[ET], /) -> None:
+        self._name: str = name
+        self._func: Callable[[ET], ET] = func
+        self._arg: Token[ET] = arg
+
+    @property
+    def name(self, /) -> str:
+        return self._name
+
+    @property
+    def op(self, /) -> Callable[[ET], ET]:
+        return self._func
+
+    @property
+    def children(self, /) -> Tuple[Token[ET], ...]:
+        return self._arg,
+
+    @property
+    def pure(self, /) -> bool:
+        return not is_impure(self._func)
+
+    @property
+    def signature(self, /) -> Hashable:
+        # Calls to impure functions are never structurally identical to one another
+        if not self.pure:
+            return self._name, self._func, id(self)
+        return self._name, self._func
+
+    def eval(self, /) -> ET:
+        return self._func(self._arg.eval())
+
+
+class Aggregate(Token):
+    __slots__ = '_name', '_func', '_items'
+
+    def __init__(self, name: str, func: Callable[[Sequence[ET]], ET], items: Sequence[Token[ET]], /) -> None:
+        self._name: str = name
+        self._func: Callable[[Sequence[ET]], ET] = func
+        self._items: Tuple[Token[ET], ...] = tuple(items)
+
+    @property
+    def name(self, /) -> str:
+        return self._name
+
+    @property
+    def op(self, /) -> Callable[[Sequence[ET]], ET]:
+        return self._func
+
+    @property
+    def children(self, /) -> Tuple[Token[ET], ...]:
+        return self._items
+
+    @property
+    def pure(self, /) -> bool:
+        return not is_impure(self._func)
+
+    @property
+    def signature(self, /) -> Hashable:
+        # Calls to impure aggregates are never structurally identical to one another
+        if not self.pure:
+            return self._name, self._func, id(self)
+        return self._name, self._func
+
+    def eval(self, /) -> ET:
+        return self._func([item.eval() for item in self._items])
+
+
+class Assign(Token):
+    __slots__ = '_name', '_value', '_scope'
+
+    def __init__(self, name: str, value: Token[ET], scope: MutableMapping[str, ET], /) -> None:
+        self._name: str = name
+        self._value: Token[ET] = value
+        self._scope: MutableMapping[str, ET] = scope
+
+    @property
+    def name(self, /) -> str:
+        return self._name
+
+    @property
+    def scope(self, /) -> MutableMapping[str, ET]:
+        return self._scope
+
+    @property
+    def children(self, /) -> Tuple[Token[ET], ...]:
+        return self._value,
+
+    @property
+    def signature(self, /) -> Hashable:
+        # Every assignment has to happen, so none are structurally identical to one another
+        return self._name, id(self._scope), id(self)
+
+    def eval(self, /) -> ET:
+        self._scope[self._name] = value = self._value.eval()
+        return value
+
+
 class Operator(Token):
     __slots__ = '_left', '_right'
 
+    op: Callable[[ET, ET], ET]
+
     def __init__(self, left: Token[ET], right: Token[ET], /) -> None:
         self._left: Token[ET] = left
         self._right: Token[ET] = right
 
+    @property
+    def children(self, /) -> Tuple[Token[ET], ...]:
+        return self._left, self._right
+
     def eval(self, /) -> ET:
-        raise NotImplementedError
+        return self.op(self._left.eval(), self._right.eval())
 
 
 class Add(Operator):
-    def eval(self, /) -> ET:
-        return self._left.eval() + self._right.eval()
+    op = staticmethod(operator.add)
 
 
 class Sub(Operator):
-    def eval(self, /) -> ET:
-        return self._left.eval() - self._right.eval()
+    op = staticmethod(operator.sub)
 
 
 class Mul(Operator):
-    def eval(self, /) -> ET:
-        return self._left.eval() * self._right.eval()
+    op = staticmethod(operator.mul)
 
 
 class Div(Operator):
-    def eval(self, /) -> ET:
-        return self._left.eval() / self._right.eval()
+    op = staticmethod(operator.truediv)
 
 
 class FloorDiv(Operator):
-    def eval(self, /) -> ET:
-        return self._left.eval() // self._right.eval()
+    op = staticmethod(operator.floordiv)
 
 
 class Mod(Operator):
-    def eval(self, /) -> ET:
-        return self._left.eval() % self._right.eval()
+    op = staticmethod(operator.mod)
 
 
 class Pow(Operator):
+    op = staticmethod(operator.pow)
+
+
+class Neg(Token):
+    __slots__ = '_left',
+
+    op = staticmethod(operator.neg)
+
+    def __init__(self, left: Token[ET], /) -> None:
+        self._left: Token[ET] = left
+
+    @property
+    def children(self, /) -> Tuple[Token[ET], ...]:
+        return self._left,
+
     def eval(self, /) -> ET:
-        return self._left.eval() ** self._right.eval()
+        return self.op(self._left.eval())
 
 
 class Factorial(Token):
@@ -98,8 +295,16 @@ class Factorial(Token):
     def __init__(self, left: Token[ET], /) -> None:
         self._left: Token[ET] = left
 
-    def eval(self, /) -> ET:
+    @property
+    def children(self, /) -> Tuple[Token[ET], ...]:
+        return self._left,
+
+    @staticmethod
+    def op(value: ET, /) -> ET:
         try:
-            return cast(math.factorial(int(self._left.eval())))
+            return cast(math.factorial(int(value)))
         except ValueError:
             return cast(0)
+
+    def eval(self, /) -> ET:
+        return self.op(self._left.eval())
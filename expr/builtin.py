@@ -1,5 +1,8 @@
-from decimal import Decimal, getcontext
-from typing import Callable, Tuple, TypeVar
+import math
+import sys
+
+from decimal import Decimal, getcontext, localcontext
+from typing import Any, Callable, Dict, Sequence, Tuple, TypeVar
 from functools import wraps
 
 
@@ -12,7 +15,12 @@ __all__: Tuple[str, ...] = (
     'phi',
     'tau',
     'sin',
-    'cos'
+    'cos',
+    'total',
+    'product',
+    'mean',
+    'impure',
+    'is_impure'
 )
 
 
@@ -25,6 +33,37 @@ tau: Decimal = Decimal('6.283185307179586476925286766559005768394338')
 one_third: Decimal = Decimal('0.33333333333333333333333333333333333333333')
 one_sixth: Decimal = Decimal('0.16666666666666666666666666666666666666667')
 
+_tau: float = float(tau)
+_one_third: float = float(one_third)
+
+# Unit roundoff of hardware floats, the largest relative error of a correctly rounded operation
+unit_roundoff: float = sys.float_info.epsilon / 2
+
+
+def impure(func: Callable[..., Any], /) -> Callable[..., Any]:
+    """
+    Marks a builtin function as impure, meaning it may return
+    different results for the same input (E.g. random numbers).
+
+    Results of expressions calling impure functions are never memoized or shared.
+    """
+    try:
+        func.__expr_impure__ = True
+    except AttributeError:
+        # Functions implemented in C don't allow setting attributes
+        @wraps(func)
+        def inner(*args: Any) -> Any:
+            return func(*args)
+
+        inner.__expr_impure__ = True
+        return inner
+
+    return func
+
+
+def is_impure(func: Callable[..., Any], /) -> bool:
+    return getattr(func, '__expr_impure__', False)
+
 
 # https://docs.python.org/3/library/decimal.html#recipes
 
@@ -74,3 +113,115 @@ def cos(x: DT, /) -> DT:
 
     getcontext().prec -= 2
     return +s
+
+
+# Aggregates, these take every item of a list at once
+
+def total(values: Sequence[DT], /) -> DT:
+    # A few extra digits keep rounding errors from accumulating across many values
+    with localcontext() as ctx:
+        ctx.prec += len(str(len(values))) + 2
+        s = sum(values, Decimal(0))
+
+    return +s
+
+
+def product(values: Sequence[DT], /) -> DT:
+    with localcontext() as ctx:
+        ctx.prec += len(str(len(values))) + 2
+        p = math.prod(values, start=Decimal(1))
+
+    return +p
+
+
+def mean(values: Sequence[DT], /) -> DT:
+    with localcontext() as ctx:
+        ctx.prec += 2
+        m = total(values) / len(values)
+
+    return +m
+
+
+def _product_error(values: Sequence[float], errors: Sequence[float], result: float, /) -> float:
+    if not result:
+        return 0.0 if not any(errors) else math.inf
+    return abs(result) * (math.fsum(e / abs(v) for v, e in zip(values, errors)) + len(values) * unit_roundoff)
+
+
+# Hardware float counterparts of the default builtins, used by adaptive-precision evaluation.
+# Each is paired with the absolute value of its derivative, bounding how much error in the input is amplified.
+float_builtins: Dict[str, Tuple[Callable[[float], float], Callable[[float], float]]] = {
+    'rad': (math.radians, lambda x: math.pi / 180),
+    'sin': (lambda x: math.sin(x % _tau if x > _tau else x), lambda x: 1.0),
+    'cos': (lambda x: math.cos(x % _tau if x > _tau else x), lambda x: 1.0),
+    'tan': (math.tan, lambda x: 1 + math.tan(x) ** 2),
+    'asin': (math.asin, lambda x: 1 / math.sqrt(1 - x * x)),
+    'acos': (math.acos, lambda x: 1 / math.sqrt(1 - x * x)),
+    'atan': (math.atan, lambda x: 1 / (1 + x * x)),
+    'log': (math.log2, lambda x: 1 / (abs(x) * math.log(2))),
+    'log10': (math.log10, lambda x: 1 / (abs(x) * math.log(10))),
+    'ln': (math.log, lambda x: 1 / abs(x)),
+    'sqrt': (math.sqrt, lambda x: 0.5 / math.sqrt(x)),
+    'cbrt': (lambda x: x ** _one_third, lambda x: _one_third * x ** (_one_third - 1)),
+}
+
+# Hardware float counterparts of the default aggregates, each paired with a function
+# bounding the absolute error of its result given the error of every item.
+float_aggregates: Dict[str, Tuple[Callable[[Sequence[float]], float], Callable[[Sequence[float], Sequence[float], float], float]]] = {
+    'sum': (math.fsum, lambda v, e, r: math.fsum(e) + abs(r) * unit_roundoff),
+    'mean': (lambda v: math.fsum(v) / len(v), lambda v, e, r: math.fsum(e) / len(v) + 2 * abs(r) * unit_roundoff),
+    'min': (min, lambda v, e, r: max(e)),
+    'max': (max, lambda v, e, r: max(e)),
+    'prod': (math.prod, _product_error),
+}
+
+
+# Derivatives of the default builtins, used by forward-mode differentiation
+derivatives: Dict[str, Callable[[DT], DT]] = {
+    # rad multiplies by a float conversion factor, which the pi constant doesn't match
+    'rad': lambda x: Decimal(math.radians(1)),
+    'sin': lambda x: cos(x),
+    'cos': lambda x: -sin(x),
+    'tan': lambda x: 1 / cos(x) ** 2,
+    'asin': lambda x: 1 / (1 - x * x).sqrt(),
+    'acos': lambda x: -1 / (1 - x * x).sqrt(),
+    'atan': lambda x: 1 / (1 + x * x),
+    'log': lambda x: 1 / (x * Decimal(2).ln()),
+    'log10': lambda x: 1 / (x * Decimal(10).ln()),
+    'ln': lambda x: 1 / x,
+    'sqrt': lambda x: 1 / (2 * x.sqrt()),
+    'cbrt': lambda x: one_third * x ** (one_third - 1),
+}
+
+
+def _product_partials(values: Sequence[DT], result: DT, /) -> Sequence[DT]:
+    # Products of every other item, without dividing by items that could be zero
+    partials = [Decimal(1)] * len(values)
+
+    prefix = Decimal(1)
+    for i, value in enumerate(values):
+        partials[i] = prefix
+        prefix *= value
+
+    suffix = Decimal(1)
+    for i in range(len(values) - 1, -1, -1):
+        partials[i] *= suffix
+        suffix *= values[i]
+
+    return partials
+
+
+def _selected_partials(values: Sequence[DT], result: DT, /) -> Sequence[DT]:
+    partials = [Decimal(0)] * len(values)
+    partials[values.index(result)] = Decimal(1)
+    return partials
+
+
+# Partial derivatives of the default aggregates with respect to each of their items
+aggregate_derivatives: Dict[str, Callable[[Sequence[DT], DT], Sequence[DT]]] = {
+    'sum': lambda v, r: [Decimal(1)] * len(v),
+    'mean': lambda v, r: [Decimal(1) / len(v)] * len(v),
+    'prod': _product_partials,
+    'min': _selected_partials,
+    'max': _selected_partials,
+}
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Generic, Hashable, NamedTuple, Optional, Tuple, TypeVar
+
+__all__: Tuple[str, ...] = (
+    'CacheInfo',
+    'ResultCache'
+)
+
+VT: TypeVar = TypeVar('VT')
+
+_missing = object()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: Optional[int]
+    currsize: int
+
+    @property
+    def hit_rate(self, /) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResultCache(Generic[VT]):
+    """
+    A bounded least-recently-used cache whose entries can optionally expire.
+
+    Parameters
+    ----------
+    maxsize: Optional[int]
+        The maximum amount of entries to keep. ``None`` means unbounded.
+    ttl: Optional[float]
+        The amount of seconds an entry stays valid for. ``None`` means entries never expire.
+    """
+
+    __slots__ = '_maxsize', '_ttl', '_entries', '_lock', '_hits', '_misses', '_evictions'
+
+    def __init__(self, /, maxsize: Optional[int] = 128, ttl: Optional[float] = None) -> None:
+        if maxsize is not None and maxsize < 0:
+            raise ValueError('maxsize must not be negative')
+
+        self._maxsize: Optional[int] = maxsize
+        self._ttl: Optional[float] = ttl
+        self._entries: OrderedDict[Hashable, Tuple[float, VT]] = OrderedDict()
+        self._lock: Lock = Lock()
+
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    @property
+    def maxsize(self, /) -> Optional[int]:
+        return self._maxsize
+
+    @property
+    def ttl(self, /) -> Optional[float]:
+        return self._ttl
+
+    @property
+    def hit_rate(self, /) -> float:
+        return self.info().hit_rate
+
+    def __len__(self, /) -> int:
+        return len(self._entries)
+
+    def __repr__(self, /) -> str:
+        return f'<expr.{self.__class__.__name__} size={len(self._entries)} maxsize={self._maxsize} ttl={self._ttl}>'
+
+    def get(self, key: Hashable, default: VT = None, /) -> Optional[VT]:
+        with self._lock:
+            entry = self._entries.get(key, _missing)
+
+            if entry is not _missing:
+                expires, value = entry
+                if expires >= monotonic():
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+
+                del self._entries[key]
+                self._evictions += 1
+
+            self._misses += 1
+            return default
+
+    def put(self, key: Hashable, value: VT, /) -> None:
+        if self._maxsize == 0:
+            return
+
+        expires = monotonic() + self._ttl if self._ttl is not None else float('inf')
+
+        with self._lock:
+            self._entries[key] = expires, value
+            self._entries.move_to_end(key)
+
+            if self._maxsize is not None and len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def info(self, /) -> CacheInfo:
+        return CacheInfo(self._hits, self._misses, self._evictions, self._maxsize, len(self._entries))
+
+    def clear(self, /) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
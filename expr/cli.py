@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sys
+
+from contextlib import ExitStack
+from decimal import getcontext, localcontext
+from itertools import chain, islice
+from multiprocessing import Pool
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+from .compiled import CompiledExpression
+from .errors import EvaluatorError
+from .parser import Parser
+
+__all__: Tuple[str, ...] = (
+    'main',
+)
+
+Outcome = Tuple[Optional[str], Optional[str]]
+
+# Worker state, set up once per process so grammar tables are only built once
+_state: Optional[Parser] = None
+_formula: Optional[CompiledExpression] = None
+_adaptive: bool = False
+
+
+def _setup(formula: Optional[str], variables: Dict[str, str], adaptive: bool, /) -> None:
+    global _state, _formula, _adaptive
+
+    _adaptive = adaptive
+
+    # Forked workers inherit the state the parent process already built
+    if _state is None:
+        _state = Parser(variables=variables)
+
+        # Compiling builds the grammar tables up front, before any workers are forked
+        compiled = _state.compile(formula if formula is not None else '0')
+        _formula = compiled if formula is not None else None
+
+
+def _setup_worker(precision: Optional[int], *setup: Any) -> None:
+    # Worker processes own their context, whereas the main process only changes it locally
+    if precision is not None:
+        getcontext().prec = precision
+
+    _setup(*setup)
+
+
+def _evaluate(item: Any, /) -> Outcome:
+    try:
+        if _formula is not None:
+            result = _formula.evaluate_adaptive(item) if _adaptive else _formula.evaluate(item)
+        elif isinstance(item, tuple):
+            # An expression along with the variables declared before it
+            expression, declared = item
+            result = _state.compile(expression).evaluate(declared)
+        else:
+            result = _state.evaluate(item)
+
+    # A single bad row shouldn't lose every row after it
+    except Exception as exc:
+        return None, getattr(exc, 'friendly', None) or str(exc) or exc.__class__.__name__
+
+    return (None if result is None else str(result)), None
+
+
+def _distribute(
+    pool: Pool,
+    expressions: Sequence[str],
+    declared: Optional[Dict[str, Any]],
+    chunksize: int,
+    /
+) -> Tuple[List[Outcome], Optional[Dict[str, Any]]]:
+    # Workers each have their own state, so declarations are evaluated here in order,
+    # and the variables declared so far are sent along with every expression after them
+    outcomes: List[Optional[Outcome]] = [None] * len(expressions)
+    remote: List[Tuple[int, Any]] = []
+
+    for i, expression in enumerate(expressions):
+        if '=' in expression:
+            outcomes[i] = _evaluate(expression)
+            declared = dict(_state._variables)
+        else:
+            remote.append((i, (expression, declared) if declared is not None else expression))
+
+    for (i, _), outcome in zip(remote, pool.map(_evaluate, [item for _, item in remote], chunksize=chunksize)):
+        outcomes[i] = outcome
+
+    return outcomes, declared
+
+
+def _parse_define(value: str, /) -> Tuple[str, str]:
+    name, sep, number = value.partition('=')
+    if not sep or not name.strip():
+        raise argparse.ArgumentTypeError(f'expected NAME=VALUE, got {value!r}')
+    return name.strip(), number.strip()
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='expr',
+        description='Evaluate math expressions in bulk.',
+        epilog='Expressions are read one per line. If --formula is given, '
+               'inputs are instead CSV files whose header names the variables of the formula. '
+               'With --jobs, lines declaring variables are evaluated in order by the main process.'
+    )
+    parser.add_argument('files', nargs='*', default=['-'], help='files to read from, "-" for stdin (default)')
+    parser.add_argument('-f', '--formula', help='a formula to evaluate once for every CSV row')
+    parser.add_argument('-D', '--define', action='append', default=[], type=_parse_define, metavar='NAME=VALUE',
+                        help='define a variable, may be repeated')
+    parser.add_argument('-o', '--output', default='-', help='file to write results to, "-" for stdout (default)')
+    parser.add_argument('--format', choices=('text', 'csv', 'jsonl'), default='text', help='output format')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='amount of worker processes to evaluate with')
+    parser.add_argument('--chunksize', type=int, default=256, help='amount of rows sent to a worker at once')
+    parser.add_argument('--precision', type=int, help='significant digits of Decimal arithmetic')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='evaluate the formula in floats, falling back to Decimal when they are too imprecise')
+    parser.add_argument('-q', '--quiet', action='store_true', help='do not print throughput statistics')
+    return parser
+
+
+def _read_expressions(streams: Iterable[TextIO], /) -> Iterator[Tuple[Dict[str, str], str]]:
+    for line in chain.from_iterable(streams):
+        line = line.strip()
+        if line:
+            yield {'expression': line}, line
+
+
+def _read_rows(streams: Iterable[TextIO], /) -> Iterator[Tuple[Dict[str, str], Dict[str, str]]]:
+    for stream in streams:
+        for row in csv.DictReader(stream):
+            # Empty cells are treated as missing, falling back to variables defined by --define
+            yield row, {name: value for name, value in row.items() if name is not None and value}
+
+
+class _Writer:
+    def __init__(self, stream: TextIO, fmt: str, columns: Sequence[str], /) -> None:
+        self.stream: TextIO = stream
+        self.format: str = fmt
+        self.columns: Sequence[str] = columns
+        self.csv: Optional[Any] = None
+
+        if fmt == 'csv':
+            self.csv = csv.writer(stream)
+            self.csv.writerow([*columns, 'result', 'error'])
+
+    def write(self, row: Dict[str, str], result: Optional[str], error: Optional[str], /) -> None:
+        if self.format == 'text':
+            self.stream.write(f'{error if error is not None else result or ""}\n')
+        elif self.format == 'csv':
+            self.csv.writerow([*map(row.get, self.columns), result, error])
+        else:
+            self.stream.write(json.dumps({**row, 'result': result, 'error': error}) + '\n')
+
+
+def _batches(source: Iterator[Tuple[Dict[str, str], Any]], size: int, /) -> Iterator[List[Tuple[Dict[str, str], Any]]]:
+    while batch := list(islice(source, size)):
+        yield batch
+
+
+def main(argv: Optional[List[str]] = None, /) -> int:
+    global _state
+
+    cli = _build_parser()
+    args = cli.parse_args(argv)
+    if args.jobs < 1:
+        args.jobs = 1
+
+    variables = dict(args.define)
+    setup = args.formula, variables, args.adaptive
+
+    with ExitStack() as stack:
+        try:
+            streams = [
+                sys.stdin if path == '-' else stack.enter_context(open(path, newline='', encoding='utf-8'))
+                for path in args.files
+            ]
+            output = sys.stdout if args.output == '-' else stack.enter_context(
+                open(args.output, 'w', newline='', encoding='utf-8')
+            )
+        except OSError as exc:
+            cli.error(f"can't open {exc.filename!r}: {exc.strerror}")
+
+        # Only workers forked from this process may reuse its state
+        _state = None
+
+        # Precision only applies to this run rather than to whoever called main()
+        context = stack.enter_context(localcontext())
+        if args.precision is not None:
+            context.prec = args.precision
+
+        try:
+            _setup(*setup)
+        except EvaluatorError as exc:
+            print(f'expr: {exc.friendly}', file=sys.stderr)
+            return 2
+
+        if args.formula is None:
+            source = _read_expressions(streams)
+            columns = ['expression']
+        else:
+            source = _read_rows(streams)
+            first = next(source, None)
+            columns = list(first[0]) if first is not None else []
+            source = chain([first], source) if first is not None else iter(())
+
+        writer = _Writer(output, args.format, columns)
+        pool = stack.enter_context(Pool(args.jobs, initializer=_setup_worker, initargs=(args.precision, *setup))) if args.jobs > 1 else None
+
+        start = perf_counter()
+        total = failed = 0
+        declared = None
+
+        # Inputs are read a bounded batch at a time, so arbitrarily large inputs can be streamed
+        for batch in _batches(source, args.jobs * args.chunksize * 4):
+            rows, items = zip(*batch)
+
+            if pool is None:
+                outcomes = map(_evaluate, items)
+            elif args.formula is None:
+                outcomes, declared = _distribute(pool, items, declared, args.chunksize)
+            else:
+                outcomes = pool.map(_evaluate, items, chunksize=args.chunksize)
+
+            for row, (result, error) in zip(rows, outcomes):
+                writer.write(row, result, error)
+                total += 1
+                failed += error is not None
+
+        output.flush()
+        elapsed = perf_counter() - start
+
+    if not args.quiet:
+        rate = total / elapsed if elapsed else float('inf')
+        print(
+            f'expr: evaluated {total} row(s) ({failed} failed) in {elapsed:.3f}s, '
+            f'{rate:,.0f} rows/s with {args.jobs} job(s)',
+            file=sys.stderr
+        )
+
+    return 1 if failed else 0
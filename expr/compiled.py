@@ -0,0 +1,594 @@
+from __future__ import annotations
+
+import math
+
+from decimal import Decimal, getcontext, localcontext
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple, Type, TypeVar, Union
+
+from .ast import *
+from .builtin import unit_roundoff as _unit
+from .cache import ResultCache
+from .errors import CastingError, NotDifferentiable, UnknownPointer, _translate
+from .util import T as DT, cast
+
+if TYPE_CHECKING:
+    from .parser import Parser
+
+OT: TypeVar = TypeVar('OT', bound=Union[float, Decimal])
+
+_missing = object()
+
+# Integers below this are exactly representable in hardware floats
+_exact_integers: float = 2.0 ** 53
+
+__all__: Tuple[str, ...] = (
+    'CompiledExpression',
+    'CompiledBatch'
+)
+
+
+class Program:
+    """
+    A flattened view of one or more syntax trees with common subexpressions eliminated.
+
+    Every structurally distinct subtree is given exactly one slot,
+    so shared subexpressions are only evaluated once per run.
+    """
+
+    __slots__ = 'nodes', 'operands', 'outputs', 'names', 'pure'
+
+    def __init__(self, roots: Iterable[Token], /) -> None:
+        self.nodes: List[Token] = []
+        self.operands: List[Tuple[int, ...]] = []
+        self.outputs: List[int] = []
+        self.names: Dict[str, int] = {}
+        self.pure: bool = True
+
+        # Slots of visited nodes by id, along with how many assignments had been visited at the time.
+        # Interned nodes are shared, so a node visited before an assignment must be visited again after it.
+        slots: Dict[int, Tuple[int, int]] = {}
+        keys: Dict[Hashable, int] = {}
+        epoch = 0
+
+        for root in roots:
+            # Iterative post-order walk, deep left-associative chains would exceed the recursion limit
+            stack = [(root, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if slots.get(id(node), (None, None))[1] == epoch:
+                    continue
+
+                if not expanded:
+                    stack.append((node, True))
+                    stack.extend((child, False) for child in reversed(node.children))
+                    continue
+
+                operands = tuple(slots[id(child)][0] for child in node.children)
+                key = type(node), node.signature, operands
+
+                try:
+                    slot = keys[key]
+                except KeyError:
+                    slot = keys[key] = len(self.nodes)
+                    self.nodes.append(node)
+                    self.operands.append(operands)
+
+                    if isinstance(node, Name):
+                        self.names.setdefault(node.name, slot)
+                    elif isinstance(node, Assign):
+                        # Later reads of this name must not reuse the value from before the assignment
+                        keys.pop((Name, node.name, ()), None)
+                        self.pure = False
+                        epoch += 1
+                    elif isinstance(node, (Call, Aggregate)) and not node.pure:
+                        self.pure = False
+
+                slots[id(node)] = slot, epoch
+
+            self.outputs.append(slots[id(root)][0])
+
+    def __len__(self, /) -> int:
+        return len(self.nodes)
+
+    @staticmethod
+    def resolve(name: str, parser: Parser, variables: Mapping[str, Any], /) -> DT:
+        try:
+            value = variables[name] if name in variables else parser._variables[name]
+        except KeyError:
+            raise UnknownPointer(name)
+
+        if not isinstance(value, Decimal):
+            _casted = cast(value)
+            if _casted is None:
+                raise CastingError(f'could not cast {value!r} to a number.')
+            value = _casted
+
+        return value
+
+    def run(self, parser: Parser, variables: Optional[Mapping[str, Any]] = None, /) -> List[Optional[DT]]:
+        variables = variables or {}
+        scope = parser._variables
+        values: List[Optional[DT]] = [None] * len(self.nodes)
+
+        for slot, (node, operands) in enumerate(zip(self.nodes, self.operands)):
+            kind = type(node)
+
+            if kind is Number:
+                values[slot] = node.eval()
+
+            elif kind is Name:
+                values[slot] = self.resolve(node.name, parser, variables)
+
+            elif kind is Assign:
+                scope[node.name] = values[slot] = values[operands[0]]
+                if node.name in variables:
+                    # Later reads see the assignment rather than the binding it replaced
+                    variables = {**variables, node.name: values[slot]}
+
+            elif kind is Aggregate:
+                values[slot] = node.op([values[i] for i in operands])
+
+            else:
+                args = [values[i] for i in operands]
+                if kind is Pow:
+                    parser._check_exponent(args[1])
+                elif kind is Factorial:
+                    parser._check_factorial(args[0])
+
+                values[slot] = node.op(*args)
+
+        return values
+
+    def run_float(self, parser: Parser, variables: Optional[Mapping[str, Any]] = None, /) -> Tuple[List[float], List[float]]:
+        """
+        Runs this program in hardware floats, tracking an upper bound of the absolute error of every slot.
+
+        Errors are infinite wherever floats can't be trusted to follow the semantics
+        of Decimal arithmetic. Arithmetic exceptions are left for the caller to handle.
+        """
+        variables = variables or {}
+        values: List[float] = [0.0] * len(self.nodes)
+        errors: List[float] = [0.0] * len(self.nodes)
+        inf = math.inf
+
+        for slot, (node, operands) in enumerate(zip(self.nodes, self.operands)):
+            kind = type(node)
+
+            if kind is Number or kind is Name:
+                exact = node.eval() if kind is Number else self.resolve(node.name, parser, variables)
+                r = float(exact)
+                values[slot] = r
+                errors[slot] = 0.0 if r == exact else abs(r) * _unit
+                continue
+
+            if kind is Neg:
+                values[slot] = -values[operands[0]]
+                errors[slot] = errors[operands[0]]
+                continue
+
+            if kind is Call:
+                a, ea = values[operands[0]], errors[operands[0]]
+                try:
+                    func, derivative = parser._float_functions[node.name]
+                except KeyError:
+                    values[slot], errors[slot] = a, inf
+                    continue
+
+                r = func(a)
+                if isinstance(r, complex):
+                    raise ValueError(f'{node.name} is undefined for {a}')
+
+                # libm functions aren't always correctly rounded, so allow two units of error
+                values[slot] = r
+                errors[slot] = derivative(a) * (ea + abs(a) * _unit) + 2 * abs(r) * _unit
+                continue
+
+            if kind is Aggregate:
+                items, item_errors = [values[i] for i in operands], [errors[i] for i in operands]
+                try:
+                    func, bound = parser._float_aggregates[node.name]
+                except KeyError:
+                    values[slot], errors[slot] = 0.0, inf
+                    continue
+
+                values[slot] = r = func(items)
+                errors[slot] = bound(items, item_errors, r)
+                continue
+
+            if kind is Factorial:
+                a, ea = values[operands[0]], errors[operands[0]]
+                parser._check_factorial(a)
+                if int(a - ea) != int(a + ea):
+                    values[slot], errors[slot] = a, inf
+                    continue
+
+                r = float(Factorial.op(int(a)))
+                values[slot] = r
+                errors[slot] = abs(r) * _unit
+                continue
+
+            (a, b), (ea, eb) = (values[i] for i in operands), (errors[i] for i in operands)
+
+            if kind is Add or kind is Sub or kind is Mul:
+                if kind is Mul:
+                    r = a * b
+                    e = abs(a) * eb + abs(b) * ea + ea * eb + abs(r) * _unit
+                else:
+                    r = a + b if kind is Add else a - b
+                    e = ea + eb + abs(r) * _unit
+
+                # Integers this small are exactly representable, so are sums and products of them
+                if not (ea or eb) and abs(r) < _exact_integers and a.is_integer() and b.is_integer():
+                    e = 0.0
+
+            elif kind is Div:
+                r = a / b
+                e = (abs(a) * eb + abs(b) * ea) / (abs(b) * (abs(b) - eb)) + abs(r) * _unit if abs(b) > eb else inf
+
+            elif kind is Pow:
+                parser._check_exponent(b)
+                r = a ** b
+                if isinstance(r, complex):
+                    raise ValueError('negative number raised to a fractional power')
+
+                if a == 0:
+                    # Decimal rejects zero raised to non-positive powers, which floats allow
+                    e = 0.0 if ea == eb == 0 and b > 0 else inf
+                else:
+                    # libm pow isn't always correctly rounded either
+                    e = abs(b * a ** (b - 1)) * ea + abs(r * math.log(abs(a))) * eb + 2 * abs(r) * _unit
+
+            elif ea or eb:
+                # Floor division and modulo are discontinuous, so any error in the operands could change the result
+                r, e = a, inf
+
+            elif not (abs(a) < _exact_integers and abs(b) < _exact_integers and abs(a / b) < _exact_integers):
+                # Floats this large aren't exact, and Decimal may not be able to represent the quotient
+                r, e = a, inf
+
+            elif a.is_integer() and b.is_integer():
+                # Decimal truncates towards zero rather than flooring
+                x, y = int(a), int(b)
+                q = abs(x) // abs(y) * (1 if (x < 0) == (y < 0) else -1)
+                r, e = float(q if kind is FloorDiv else x - q * y), 0.0
+
+            elif kind is Mod:
+                r, e = math.fmod(a, b), 0.0
+
+            else:
+                r, e = a, inf
+
+            values[slot] = r
+            errors[slot] = e
+
+        return values, errors
+
+    def tangents(self, parser: Parser, values: List[Optional[DT]], wrt: Sequence[str], /) -> List[Optional[List[DT]]]:
+        """
+        Propagates derivatives with respect to every name in ``wrt`` forwards through this program,
+        given the values of a previous :meth:`run`.
+
+        Every slot gets a list of partial derivatives ordered like ``wrt``,
+        or ``None`` if it doesn't depend on any of them.
+        """
+        index = {name: i for i, name in enumerate(wrt)}
+        zero, one = Decimal(0), Decimal(1)
+        tangents: List[Optional[List[DT]]] = [None] * len(self.nodes)
+
+        for slot, (node, operands) in enumerate(zip(self.nodes, self.operands)):
+            kind = type(node)
+
+            if kind is Name:
+                i = index.get(node.name)
+                if i is not None:
+                    tangents[slot] = tangent = [zero] * len(wrt)
+                    tangent[i] = one
+                continue
+
+            inputs = [tangents[i] for i in operands]
+            if not any(t is not None for t in inputs):
+                continue
+
+            args, r = [values[i] for i in operands], values[slot]
+
+            # Partial derivatives of this node with respect to each of its operands
+            if kind is Add:
+                partials = one, one
+            elif kind is Sub:
+                partials = one, -one
+            elif kind is Mul:
+                partials = args[1], args[0]
+            elif kind is Div:
+                partials = one / args[1], -r / args[1]
+            elif kind is Pow:
+                a, b = args
+                partials = zero, zero
+
+                # Zero can't be raised to non-positive powers, so those are special-cased
+                if inputs[0] is not None and b:
+                    if b == 1:
+                        partials = one, zero
+                    elif b < 1:
+                        # Zero raised to negative powers is infinite rather than failing, so divide by zero instead
+                        partials = b / a ** (1 - b), zero
+                    else:
+                        partials = b * a ** (b - 1), zero
+
+                # The power of zero doesn't change with the exponent, where it is defined
+                if inputs[1] is not None and r:
+                    partials = partials[0], r * a.ln()
+            elif kind is Mod:
+                partials = one, -(args[0] // args[1])
+            elif kind is FloorDiv or kind is Factorial:
+                # Piecewise constant
+                continue
+            elif kind is Neg:
+                partials = -one,
+            elif kind is Assign:
+                partials = one,
+            elif kind is Call:
+                try:
+                    partials = parser._derivatives[node.name](args[0]),
+                except KeyError:
+                    raise NotDifferentiable(node.name)
+            elif kind is Aggregate:
+                try:
+                    partials = parser._aggregate_derivatives[node.name](args, r)
+                except KeyError:
+                    raise NotDifferentiable(node.name)
+            else:
+                raise NotDifferentiable(type(node).__name__)
+
+            tangent = None
+            for partial, t in zip(partials, inputs):
+                if t is None or not partial:
+                    continue
+
+                scaled = [partial * d for d in t]
+                tangent = scaled if tangent is None else [x + y for x, y in zip(tangent, scaled)]
+
+            tangents[slot] = tangent
+
+        return tangents
+
+    def results(self, values: List[Optional[DT]], /, *, cls: Type[OT] = Decimal) -> List[Optional[OT]]:
+        # Declarations evaluate to nothing, the same as they do in Parser.evaluate
+        return [
+            None if isinstance(self.nodes[slot], Assign) else cls(values[slot])
+            for slot in self.outputs
+        ]
+
+
+class CompiledExpression:
+    """
+    An expression that was parsed once by :meth:`Parser.compile` and can be evaluated
+    many times against different variable bindings.
+    """
+
+    __slots__ = '_source', '_root', '_parser', '_program', '_names', '_cache'
+
+    def __init__(self, source: str, root: Token, parser: Parser, /) -> None:
+        self._source: str = source
+        self._root: Token = root
+        self._parser: Parser = parser
+        self._program: Program = Program([root])
+        self._names: Tuple[str, ...] = tuple(sorted(self._program.names))
+        self._cache: Optional[ResultCache[Optional[DT]]] = None
+
+    @property
+    def source(self, /) -> str:
+        return self._source
+
+    @property
+    def root(self, /) -> Token:
+        return self._root
+
+    @property
+    def parser(self, /) -> Parser:
+        return self._parser
+
+    @property
+    def names(self, /) -> FrozenSet[str]:
+        return frozenset(self._names)
+
+    @property
+    def pure(self, /) -> bool:
+        """
+        Whether this expression neither declares variables nor calls impure functions.
+        Only pure expressions have their results memoized.
+        """
+        return self._program.pure
+
+    @property
+    def cache(self, /) -> Optional[ResultCache[Optional[DT]]]:
+        return self._cache
+
+    def memoize(self, /, maxsize: Optional[int] = 128, ttl: Optional[float] = None) -> ResultCache[Optional[DT]]:
+        """
+        Caches results of this expression by the values of the variables it references.
+
+        Returns the :class:`ResultCache` used, which exposes hit-rate statistics.
+        Evaluations of impure expressions always bypass the cache.
+        """
+        self._cache = cache = ResultCache(maxsize=maxsize, ttl=ttl)
+        return cache
+
+    def __repr__(self, /) -> str:
+        return f'<expr.{self.__class__.__name__} source={self._source!r}>'
+
+    def __call__(self, variables: Optional[Mapping[str, Any]] = None, /, *, cls: Type[OT] = Decimal) -> Optional[OT]:
+        return self.evaluate(variables, cls=cls)
+
+    def evaluate(self, variables: Optional[Mapping[str, Any]] = None, /, *, cls: Type[OT] = Decimal) -> Optional[OT]:
+        if self._cache is not None and self._program.pure:
+            return self._evaluate_cached(variables or {}, cls=cls)
+
+        with _translate():
+            values = self._program.run(self._parser, variables)
+            return self._program.results(values, cls=cls)[0]
+
+    def evaluate_with_derivatives(
+        self,
+        variables: Optional[Mapping[str, Any]] = None,
+        /,
+        *,
+        wrt: Optional[Iterable[str]] = None,
+        cls: Type[OT] = Decimal
+    ) -> Tuple[Optional[OT], Dict[str, OT]]:
+        """
+        Evaluates this expression along with its partial derivatives, using forward-mode differentiation.
+
+        Derivatives are taken with respect to the names in ``wrt``, which defaults to every
+        variable in ``variables`` that this expression references.
+        Returns a tuple of the value and a dictionary mapping names to partial derivatives.
+        """
+        variables = variables or {}
+        wrt = tuple(wrt) if wrt is not None else tuple(name for name in self._names if name in variables)
+
+        with _translate():
+            values = self._program.run(self._parser, variables)
+            tangent = self._program.tangents(self._parser, values, wrt)[self._program.outputs[0]]
+            result = self._program.results(values, cls=cls)[0]
+
+            if tangent is None:
+                return result, {name: cls(0) for name in wrt}
+            return result, {name: cls(d) for name, d in zip(wrt, tangent)}
+
+    def gradient(
+        self,
+        variables: Optional[Mapping[str, Any]] = None,
+        /,
+        *,
+        wrt: Optional[Iterable[str]] = None,
+        cls: Type[OT] = Decimal
+    ) -> Dict[str, OT]:
+        """
+        Returns the partial derivatives of this expression at the given variables.
+        See :meth:`evaluate_with_derivatives`.
+        """
+        return self.evaluate_with_derivatives(variables, wrt=wrt, cls=cls)[1]
+
+    def gradients(
+        self,
+        points: Iterable[Mapping[str, Any]],
+        /,
+        *,
+        wrt: Optional[Iterable[str]] = None,
+        cls: Type[OT] = Decimal
+    ) -> List[Tuple[Optional[OT], Dict[str, OT]]]:
+        """
+        Evaluates this expression along with its partial derivatives at each of many points.
+        See :meth:`evaluate_with_derivatives`.
+        """
+        wrt = tuple(wrt) if wrt is not None else None
+        return [self.evaluate_with_derivatives(point, wrt=wrt, cls=cls) for point in points]
+
+    def evaluate_adaptive(
+        self,
+        variables: Optional[Mapping[str, Any]] = None,
+        /,
+        *,
+        rel_tol: float = 1e-9,
+        abs_tol: float = 0.0,
+        precision: Optional[int] = None,
+        cls: Type[OT] = Decimal
+    ) -> Optional[OT]:
+        """
+        Evaluates this expression in hardware floats while bounding the error of the result.
+
+        If the error bound exceeds both ``rel_tol`` times the result and ``abs_tol``,
+        or floats overflow or fail, this expression is evaluated again using Decimal arithmetic
+        with ``precision`` significant digits (the current context's precision if ``None``).
+
+        Expressions that aren't pure are always evaluated using Decimal arithmetic.
+        """
+        if self._program.pure:
+            try:
+                values, errors = self._program.run_float(self._parser, variables)
+            except (ArithmeticError, ValueError, TypeError):
+                pass
+            else:
+                slot = self._program.outputs[0]
+                result, error = values[slot], errors[slot]
+
+                allowed = max(rel_tol * abs(result), abs_tol)
+
+                if math.isfinite(result) and error <= allowed:
+                    if issubclass(cls, Decimal):
+                        return cls(self._round(result, error, allowed))
+                    return cls(result)
+
+        with localcontext() as ctx:
+            if precision is not None:
+                ctx.prec = precision
+
+            with _translate():
+                values = self._program.run(self._parser, variables)
+                return self._program.results(values, cls=cls)[0]
+
+    @staticmethod
+    def _round(result: float, error: float, allowed: float, /) -> Decimal:
+        # Only keep the digits the error bound vouches for, so that 0.1 + 0.2 is 0.3 rather than 0.3000000000000000444...
+        if error == 0 or result == 0:
+            return Decimal(result)
+
+        digits = min(max(int(math.log10(abs(result) / error)), 1), 17)
+        rounded = f'{result:.{digits}g}'
+
+        if abs(float(rounded) - result) + error <= allowed:
+            return Decimal(rounded)
+        return Decimal(repr(result))
+
+    def _evaluate_cached(self, variables: Mapping[str, Any], /, *, cls: Type[OT]) -> Optional[OT]:
+        with _translate():
+            bound = [Program.resolve(name, self._parser, variables) for name in self._names]
+
+            # Results depend on the precision of the current context as well
+            key = getcontext().prec, *map(str, bound)
+            result = self._cache.get(key, _missing)
+
+            if result is _missing:
+                values = self._program.run(self._parser, dict(zip(self._names, bound)))
+                result = values[self._program.outputs[0]]
+                self._cache.put(key, result)
+
+            return cls(result)
+
+
+class CompiledBatch:
+    """
+    Evaluates many compiled expressions over the same variable bindings,
+    computing subexpressions they share only once per evaluation.
+    """
+
+    __slots__ = '_expressions', '_parser', '_program'
+
+    def __init__(self, *expressions: CompiledExpression) -> None:
+        parsers = {id(expression.parser) for expression in expressions}
+        if len(parsers) > 1:
+            raise ValueError('all expressions in a batch must be compiled by the same parser')
+
+        self._expressions: Tuple[CompiledExpression, ...] = expressions
+        self._parser: Optional[Parser] = expressions[0].parser if expressions else None
+        self._program: Program = Program(expression.root for expression in expressions)
+
+    @property
+    def expressions(self, /) -> Tuple[CompiledExpression, ...]:
+        return self._expressions
+
+    def __len__(self, /) -> int:
+        return len(self._expressions)
+
+    def __repr__(self, /) -> str:
+        return f'<expr.{self.__class__.__name__} expressions={len(self._expressions)}>'
+
+    def __call__(self, variables: Optional[Mapping[str, Any]] = None, /, *, cls: Type[OT] = Decimal) -> List[Optional[OT]]:
+        return self.evaluate(variables, cls=cls)
+
+    def evaluate(self, variables: Optional[Mapping[str, Any]] = None, /, *, cls: Type[OT] = Decimal) -> List[Optional[OT]]:
+        if self._parser is None:
+            return []
+
+        with _translate():
+            values = self._program.run(self._parser, variables)
+            return self._program.results(values, cls=cls)
@@ -1,8 +1,9 @@
-from decimal import Decimal
+from contextlib import contextmanager
+from decimal import Decimal, DivisionByZero as _ZeroDivision, DivisionUndefined, InvalidOperation
 from rply.token import Token, SourcePosition
 from rply.lexer import LexingError
 
-from typing import Tuple
+from typing import Iterator, Tuple
 
 
 __all__: Tuple[str, ...] = (
@@ -14,16 +15,21 @@ __all__: Tuple[str, ...] = (
     'NumberOverflow',
     'ExponentOverflow',
     'FactorialOverflow',
+    'ListOverflow',
     'InvalidSyntax',
     'UnknownPointer',
     'DivisionByZero',
     'Gibberish',
-    'InvalidAction'
+    'InvalidAction',
+    'UnexpectedList',
+    'NotDifferentiable'
 )
 
 
 class EvaluatorError(Exception):
-    ...
+    @property
+    def friendly(self) -> str:
+        return f'[ERROR] {self}'
 
 
 class CastingError(ValueError, EvaluatorError):
@@ -85,6 +91,17 @@ class FactorialOverflow(Overflow):
         return f'[OVERFLOW] Factorial {self.number} is too large'
 
 
+class ListOverflow(Overflow):
+    def __init__(self, length: int, max_length: int) -> None:
+        self.length: int = length
+        self.max_length: int = max_length
+        super().__init__(f'list of {length} items surpasses max safe length of {max_length}')
+
+    @property
+    def friendly(self) -> str:
+        return f'[OVERFLOW] List of {self.length} items is too long'
+
+
 class Gibberish(ParsingError):
     def __init__(self, original: LexingError) -> None:
         self.original: LexingError = original
@@ -143,3 +160,47 @@ class InvalidAction(ParsingError):
     @property
     def friendly(self) -> str:
         return f'[ERROR] Invalid operation'
+
+
+class UnexpectedList(ParsingError):
+    def __init__(self, function: str) -> None:
+        self.function: str = function
+        super().__init__(f'function {function!r} does not take a list')
+
+    @property
+    def friendly(self) -> str:
+        return f'[ERROR] Function {self.function!r} does not take a list'
+
+
+class NotDifferentiable(ParsingError):
+    def __init__(self, function: str) -> None:
+        self.function: str = function
+        super().__init__(f'function {function!r} has no known derivative')
+
+    @property
+    def friendly(self) -> str:
+        return f'[ERROR] Cannot differentiate function {self.function!r}'
+
+
+@contextmanager
+def _translate() -> Iterator[None]:
+    # Re-raises arithmetic errors from evaluation as their ParsingError counterparts
+    try:
+        yield
+
+    except EvaluatorError:
+        raise
+
+    except (ZeroDivisionError, _ZeroDivision):
+        raise DivisionByZero()
+
+    except (ValueError, OverflowError):
+        raise Overflow()
+
+    except InvalidOperation as exc:
+        if isinstance(exc.args[0][0], DivisionUndefined):
+            raise DivisionByZero()
+        raise InvalidAction(exc)
+
+    except LexingError as exc:
+        raise Gibberish(exc)
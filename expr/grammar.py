@@ -36,6 +36,7 @@ class LexerGenerator(_BaseGenerator):
         self.add('RPAREN', r'\)')
         self.add('LBRACE', r'\{')
         self.add('RBRACE', r'\}')
+        self.add('COMMA', ',')
         self.add('NEWLINE', r'\n')
 
     def add_operations(self, /) -> None:
@@ -2,25 +2,27 @@ from __future__ import annotations
 
 import math
 
+from contextlib import nullcontext
 from functools import wraps
+from types import MethodType
 from warnings import catch_warnings, simplefilter
 
 from decimal import (
     Decimal,
     DivisionByZero as _ZeroDivision,
-    InvalidOperation,
-    DivisionUndefined,
     getcontext
 )
 
 from rply import ParserGenerator, Token as _Token
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 
-from rply.lexer import Lexer, LexingError
+from rply.lexer import Lexer
 from rply.parser import LRParser
 
 from .ast import *
+from .compiled import CompiledExpression
 from .errors import *
+from .errors import _translate
 from .util import T as DT
 from .grammar import LexerGenerator
 from . import builtin
@@ -83,8 +85,33 @@ class ParserMeta(type):
         return super().__new__(mcs, cls, bases, attrs)
 
 
+class _CompileState:
+    """
+    Passed to rply in place of the parser itself while compiling, so grammar rules build deferred syntax trees.
+
+    Attributes are looked up on the wrapped parser and methods are bound to this state,
+    so the parser is never put into compile mode where concurrent evaluations could see it.
+    """
+
+    __slots__ = '_parser',
+
+    _compiling: bool = True
+
+    def __init__(self, parser: Parser, /) -> None:
+        self._parser: Parser = parser
+
+    def __getattr__(self, name: str, /) -> Any:
+        member = getattr(type(self._parser), name, None)
+        if callable(member) and not isinstance(member, type):
+            return MethodType(member, self)
+        return getattr(self._parser, name)
+
+
 # noinspection PyArgumentList,PyUnresolvedReferences
 class Parser(metaclass=ParserMeta):
+    # Grammar rules are given a _CompileState rather than the parser when compiling
+    _compiling: bool = False
+
     def __init__(
         self,
         /,
@@ -92,11 +119,16 @@ class Parser(metaclass=ParserMeta):
         max_safe_number: float = 9e9,
         max_exponent: float = 128,
         max_factorial: float = 64,
+        max_list_length: int = 1024,
         builtins: Dict[str, Callable[[DT], DT]] = None,
+        aggregates: Dict[str, Callable[[Sequence[DT]], DT]] = None,
+        derivatives: Dict[str, Callable[[DT], DT]] = None,
+        aggregate_derivatives: Dict[str, Callable[[Sequence[DT], DT], Sequence[DT]]] = None,
         constants: Dict[str, DT] = None,
         variables: Dict[str, DT] = None,
         decimal_cls: Type[DT] = Decimal,
-        lexer_cls: Type[LGT] = LexerGenerator
+        lexer_cls: Type[LGT] = LexerGenerator,
+        intern: bool = False
     ) -> None:
         if not issubclass(decimal_cls, Decimal):
             raise TypeError('decimal_cls must inherit from decimal.Decimal')
@@ -105,6 +137,7 @@ class Parser(metaclass=ParserMeta):
         self._max_safe_number: DT = _(max_safe_number) if max_safe_number is not None else _('inf')
         self._max_exponent: DT = _(max_exponent) if max_exponent is not None else _('inf')
         self._max_factorial: DT = _(max_factorial) if max_factorial is not None else _('inf')
+        self._max_list_length: DT = _(max_list_length) if max_list_length is not None else _('inf')
 
         _builtins: Dict[str, Callable[[DT], DT]] = {
             'rad': lambda d: _(math.radians(float(d))),
@@ -122,6 +155,15 @@ class Parser(metaclass=ParserMeta):
             **(builtins or {})
         }
 
+        _aggregates: Dict[str, Callable[[Sequence[DT]], DT]] = {
+            'sum': builtin.total,
+            'prod': builtin.product,
+            'mean': builtin.mean,
+            'min': min,
+            'max': max,
+            **(aggregates or {})
+        }
+
         _constants: Dict[str, DT] = {
             'pi': builtin.pi,
             'e': builtin.e,
@@ -131,6 +173,7 @@ class Parser(metaclass=ParserMeta):
         }
 
         self._decimal_cls: Type[DT] = decimal_cls
+        self._intern: bool = intern
 
         _lexer = lexer_cls()
         self.__lexer_generator__: Optional[LGT] = _lexer
@@ -154,6 +197,25 @@ class Parser(metaclass=ParserMeta):
         }
 
         self._functions: Dict[str, Callable[[DT], DT]] = _builtins
+        self._float_functions: Dict[str, Tuple[Callable[[float], float], Callable[[float], float]]] = {
+            name: pair for name, pair in builtin.float_builtins.items()
+            if name not in (builtins or {})
+        }
+
+        self._derivatives: Dict[str, Callable[[DT], DT]] = {
+            **{name: func for name, func in builtin.derivatives.items() if name not in (builtins or {})},
+            **(derivatives or {})
+        }
+
+        self._aggregates: Dict[str, Callable[[Sequence[DT]], DT]] = _aggregates
+        self._aggregate_derivatives: Dict[str, Callable[[Sequence[DT], DT], Sequence[DT]]] = {
+            **{name: func for name, func in builtin.aggregate_derivatives.items() if name not in (aggregates or {})},
+            **(aggregate_derivatives or {})
+        }
+        self._float_aggregates: Dict[str, Tuple[Callable[[Sequence[float]], float], Callable[..., float]]] = {
+            name: pair for name, pair in builtin.float_aggregates.items()
+            if name not in (aggregates or {})
+        }
 
     @rule('expr : NUMBER')
     def number(self, p: List[_Token], /) -> Number:
@@ -177,9 +239,10 @@ class Parser(metaclass=ParserMeta):
     def operator(self, p: List[_Token], /) -> Any:
         token_type = p[1].gettokentype()
 
+        # Compiled expressions can depend on variables, so they are checked upon evaluation instead
         if token_type == 'FAC':
-            if p[0].eval() > self._max_factorial:
-                raise FactorialOverflow(p[0].eval(), self._max_factorial)
+            if not self._compiling:
+                self._check_factorial(p[0].eval())
             return Factorial(p[0])
 
         try:
@@ -195,14 +258,16 @@ class Parser(metaclass=ParserMeta):
             )
         except KeyError:
             if token_type == 'POW':
-                if p[2].eval() > self._max_exponent:
-                    raise ExponentOverflow(p[2].eval(), self._max_exponent)
+                if not self._compiling:
+                    self._check_exponent(p[2].eval())
                 return Pow(p[0], p[2])
 
             raise BadOperation(token_type)
 
     @rule("expr : SUB expr", precedence='UMINUS')
     def uminus(self, p: List[_Token], /) -> Any:
+        if self._compiling:
+            return Neg(p[1])
         return Number(-(p[1].eval()))
 
     @rule("expr : ADD expr", precedence='UMINUS')
@@ -212,6 +277,9 @@ class Parser(metaclass=ParserMeta):
     @rule('expr : NAME EQ expr')
     def declare(self, p: List[_Token], /) -> Any:
         _name = p[0].getstr()
+        if self._compiling:
+            return Assign(_name, p[2], self._variables)
+
         _value = p[2].eval()
         self._variables[_name] = _value
 
@@ -219,10 +287,43 @@ class Parser(metaclass=ParserMeta):
     def function(self, p: List[_Token], /) -> Any:
         _name = p[0].getstr()
         if _name in self._functions:
+            if self._compiling:
+                return Call(_name, self._functions[_name], p[2])
+
             _value = p[2].eval()
             return Number(self._functions[_name](_value))
 
-        return Mul(self.getvar(p[0]), p[2])  # Probably this instead
+        return Mul(self.getvar(p[:1]), p[2])  # Probably this instead
+
+    @rule('expr : NAME LPAREN list RPAREN')
+    def aggregate(self, p: List[_Token], /) -> Any:
+        _name = p[0].getstr()
+        if _name not in self._aggregates:
+            if _name in self._functions:
+                raise UnexpectedList(_name)
+            raise UnknownPointer(_name)
+
+        if self._compiling:
+            return Aggregate(_name, self._aggregates[_name], p[2])
+
+        return Number(self._aggregates[_name]([item.eval() for item in p[2]]))
+
+    @rule('list : LBRACE items RBRACE')
+    def list_literal(self, p: List[_Token], /) -> Any:
+        return p[1]
+
+    @rule('items : expr')
+    @rule('items : items COMMA expr')
+    def list_items(self, p: List[_Token], /) -> Any:
+        if len(p) == 1:
+            return [p[0]]
+
+        # Items are appended in place, so long lists are neither quadratic nor deeply nested
+        items = p[0]
+        items.append(p[2])
+        if len(items) > self._max_list_length:
+            raise ListOverflow(len(items), self._max_list_length)
+        return items
 
     @rule("expr : expr E expr", precedence='POW')
     def scinot_e(self, p: List[_Token], /) -> Any:
@@ -231,6 +332,8 @@ class Parser(metaclass=ParserMeta):
     @rule('expr : NAME')
     def getvar(self, p: List[_Token], /) -> Any:
         name = p[0].getstr()
+        if self._compiling:
+            return Name(name)
 
         try:
             return Number(self._variables[name])
@@ -245,6 +348,14 @@ class Parser(metaclass=ParserMeta):
     def on_error(self, token: _Token, /) -> Any:
         raise InvalidSyntax(token)
 
+    def _check_exponent(self, exponent: DT, /) -> None:
+        if exponent > self._max_exponent:
+            raise ExponentOverflow(exponent, self._max_exponent)
+
+    def _check_factorial(self, number: DT, /) -> None:
+        if number > self._max_factorial:
+            raise FactorialOverflow(number, self._max_factorial)
+
     def _build(self, /) -> LRParser:
         self.__parser__ = res = self.__parser_generator__.build()
         return res
@@ -265,21 +376,24 @@ class Parser(metaclass=ParserMeta):
             parser = self.__parser__ or self._build()
             lexer = self.__lexer__ or self._build_lexer()
 
-        try:
+        with _translate():
             result = parser.parse(lexer.lex(expr), state=self)
             if result is not None:
                 return cls(result.eval())
 
-        except (ZeroDivisionError, _ZeroDivision):
-            raise DivisionByZero()
+    def compile(self, expr: str, /) -> CompiledExpression:
+        """
+        Parses an expression once without evaluating it.
 
-        except (ValueError, OverflowError):
-            raise Overflow()
+        Variables are looked up each time the returned expression is evaluated,
+        and functions are called then too.
+        """
+        with catch_warnings():
+            simplefilter('ignore')
+            parser = self.__parser__ or self._build()
+            lexer = self.__lexer__ or self._build_lexer()
 
-        except InvalidOperation as exc:
-            if isinstance(exc.args[0][0], DivisionUndefined):
-                raise DivisionByZero()
-            raise InvalidAction(exc)
+        with _translate(), interning() if self._intern else nullcontext():
+            root = parser.parse(lexer.lex(expr), state=_CompileState(self))
 
-        except LexingError as exc:
-            raise Gibberish(exc)
+        return CompiledExpression(expr, root, self)
@@ -44,6 +44,11 @@ setup(
     install_requires=[
         'rply>=0.7.8'
     ],
+    entry_points={
+        'console_scripts': [
+            'expr = expr.cli:main'
+        ]
+    },
     python_requires='>=3.8.0',
     classifiers=[
         'License :: OSI Approved :: MIT License',
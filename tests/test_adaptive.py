@@ -0,0 +1,122 @@
+import random
+
+from decimal import Decimal, localcontext
+
+import pytest
+
+import expr
+
+
+state = expr.create_state(max_exponent=None, max_safe_number=None)
+tolerances = [1e-6, 1e-12, 1e-15, 1e-20]
+
+
+def exact(f, variables):
+    with localcontext() as ctx:
+        ctx.prec = 60
+        return f.evaluate(variables)
+
+
+def assert_within(f, variables, rel_tol, abs_tol=0.0):
+    expected = exact(f, variables)
+    result = f.evaluate_adaptive(variables, rel_tol=rel_tol, abs_tol=abs_tol)
+
+    # The float result the tolerance was checked against can itself be off by a unit of roundoff
+    allowed = Decimal(max(rel_tol * abs(float(expected)), abs_tol)) * Decimal('1.000001')
+    assert abs(result - expected) <= allowed + abs(expected) * Decimal('1e-27'), (f.source, variables, result, expected)
+
+
+def points(seed, count=200):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield rng
+
+
+@pytest.mark.parametrize('rel_tol', tolerances)
+def test_division_near_zero(rel_tol):
+    f = state.compile('x / (y - z)')
+    for rng in points(1):
+        z = Decimal(str(rng.uniform(-10, 10)))
+        y = z + Decimal(str(rng.choice([1e-3, 1e-9, 1e-13, 1e-15]))) * rng.choice([-1, 1])
+        assert_within(f, {'x': str(rng.uniform(-5, 5)), 'y': y, 'z': z}, rel_tol)
+
+
+@pytest.mark.parametrize('rel_tol', tolerances)
+@pytest.mark.parametrize('source', ['x ^ y', 'x ^ 3 - y ^ 2', '(0 - x) ^ 3', '2 ^ (y / 3)'])
+def test_powers(source, rel_tol):
+    f = state.compile(source)
+    for rng in points(2):
+        assert_within(f, {'x': str(rng.uniform(0.01, 20)), 'y': str(rng.uniform(-8, 8))}, rel_tol)
+
+
+@pytest.mark.parametrize('rel_tol', tolerances)
+@pytest.mark.parametrize('source', ['x % y', '(0 - x) % y', 'x // y', '(0 - x) // y', 'x % 0.3', 'x // 0.3'])
+def test_truncating_division(source, rel_tol):
+    f = state.compile(source)
+    for rng in points(3):
+        x = rng.choice([rng.randint(-50, 50), round(rng.uniform(-50, 50), 3)])
+        y = rng.choice([rng.randint(1, 9), -rng.randint(1, 9), round(rng.uniform(0.1, 5), 2)])
+        assert_within(f, {'x': str(x), 'y': str(y)}, rel_tol, abs_tol=1e-30)
+
+
+@pytest.mark.parametrize('rel_tol', tolerances)
+@pytest.mark.parametrize('source', [
+    'sum({x, y, z})',
+    'sum({x, 0 - x, y})',
+    'mean({x, y, z})',
+    'prod({x, y, z})',
+    'min({x, y, z}) + max({x, y, z})',
+])
+def test_aggregates(source, rel_tol):
+    f = state.compile(source)
+    for rng in points(4):
+        variables = {name: str(rng.uniform(-100, 100)) for name in 'xyz'}
+        assert_within(f, variables, rel_tol, abs_tol=1e-25)
+
+
+def test_rounds_to_vouched_digits():
+    assert state.compile('0.1 + 0.2').evaluate_adaptive() == Decimal('0.3')
+    assert str(state.compile('x * 3').evaluate_adaptive({'x': 2})) == '6'
+
+
+def test_escalates_below_float_precision():
+    f = state.compile('1 / x')
+    assert f.evaluate_adaptive({'x': 3}, rel_tol=1e-20) == f.evaluate({'x': 3})
+
+
+def test_escalation_raises_exact_errors():
+    with pytest.raises(expr.DivisionByZero):
+        state.compile('1 / (x - x)').evaluate_adaptive({'x': 2})
+
+    with pytest.raises(expr.InvalidAction):
+        state.compile('cbrt(x)').evaluate_adaptive({'x': -8})
+
+
+def test_float_results():
+    assert state.compile('x / 4').evaluate_adaptive({'x': 1}, cls=float) == 0.25
+
+
+
+def assert_agrees(f, variables):
+    try:
+        expected = f.evaluate(variables)
+    except expr.EvaluatorError as exc:
+        with pytest.raises(type(exc)):
+            f.evaluate_adaptive(variables, rel_tol=0)
+    else:
+        assert f.evaluate_adaptive(variables, rel_tol=0) == expected
+
+
+@pytest.mark.parametrize('source', ['x // y', 'x % y', '(0 - x) // y', 'x % 0.3'])
+@pytest.mark.parametrize('x', [2 ** 53, 2 ** 80, 2 ** 100, 3 * 2 ** 60 + 1])
+def test_large_integers_are_not_exact(source, x):
+    assert_agrees(state.compile(source), {'x': x, 'y': 3})
+
+
+def test_zero_to_non_positive_powers():
+    with pytest.raises(expr.InvalidAction):
+        state.compile('0^0').evaluate_adaptive()
+
+    f = state.compile('x^y')
+    for y in [0, -2, 2]:
+        assert_agrees(f, {'x': 0, 'y': y})
@@ -0,0 +1,60 @@
+import random
+
+from decimal import Decimal
+
+import pytest
+
+import expr
+
+
+state = expr.create_state()
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('sum({1, 2, 3})', 6),
+    ('prod({1, 2, 3, 4})', 24),
+    ('mean({1, 2, 3, 4})', Decimal('2.5')),
+    ('max({1, -5, 3}) + min({4, 2})', 5),
+    ('2 sum({0.1, 0.2})', Decimal('0.6')),
+])
+def test_aggregates(source, expected):
+    assert state.evaluate(source) == expected
+    assert state.compile(source).evaluate() == expected
+
+
+def test_sum_keeps_precision():
+    assert state.evaluate('sum({' + ', '.join(['0.1'] * 1000) + '})') == 100
+
+
+@pytest.mark.parametrize('source', ['sum({})', '{1, 2} + 3', 'sum({1, 2,})'])
+def test_invalid_lists(source):
+    with pytest.raises(expr.InvalidSyntax):
+        state.evaluate(source)
+
+
+def test_list_length_is_limited():
+    with pytest.raises(expr.ListOverflow):
+        state.evaluate('sum({' + ', '.join(['1'] * 1025) + '})')
+
+
+def test_functions_do_not_take_lists():
+    with pytest.raises(expr.UnexpectedList) as info:
+        state.evaluate('sin({1, 2})')
+    assert 'sin' in info.value.friendly
+
+    with pytest.raises(expr.UnknownPointer):
+        state.evaluate('foo({1, 2})')
+
+
+def test_impure_aggregates_are_neither_shared_nor_memoized():
+    impure = expr.create_state(aggregates={'pick': expr.impure(random.choice)})
+    source = 'pick({1, 2, 3, 4, 5, 6, 7, 8, 9})'
+
+    f = impure.compile(f'{source} - {source}')
+    assert not f.pure
+    assert len({f.evaluate() for _ in range(50)}) > 1
+
+    g = impure.compile(source)
+    g.memoize()
+    assert len({g.evaluate() for _ in range(50)}) > 1
+    assert g.cache.info().hits == 0
@@ -0,0 +1,129 @@
+import itertools
+
+from decimal import Decimal, localcontext
+
+import pytest
+
+import expr
+
+from expr import cache as _cache
+from expr.cache import ResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(_cache, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.info() == (3, 1, 1, 2, 2)
+
+
+def test_expired_entries_are_evictions(clock):
+    cache = ResultCache(ttl=10)
+    cache.put('a', 1)
+
+    clock[0] = 10
+    assert cache.get('a') == 1
+
+    clock[0] = 10.5
+    assert cache.get('a', 'missing') == 'missing'
+    assert len(cache) == 0
+    assert cache.info() == (1, 1, 1, 128, 0)
+
+
+def test_hit_rate():
+    cache = ResultCache()
+    assert cache.hit_rate == 0.0
+
+    cache.put('a', 1)
+    for key in 'aaab':
+        cache.get(key)
+
+    assert cache.info().hit_rate == cache.hit_rate == 0.75
+
+    cache.clear()
+    assert cache.info() == (0, 0, 0, 128, 0)
+
+
+def test_zero_maxsize_stores_nothing():
+    cache = ResultCache(maxsize=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+    assert cache.info() == (0, 1, 0, 0, 0)
+
+    with pytest.raises(ValueError):
+        ResultCache(maxsize=-1)
+
+
+def test_memoized_results():
+    state = expr.create_state()
+    f = state.compile('x^2 + y')
+    cache = f.memoize(maxsize=2)
+
+    assert f.cache is cache
+    assert f.evaluate({'x': 3, 'y': 1}) == 10
+    assert f.evaluate({'x': '3', 'y': Decimal(1)}, cls=float) == 10.0
+    assert cache.info().hits == 1
+
+    # Variables the expression doesn't read don't change the key
+    assert f.evaluate({'x': 3, 'y': 1, 'z': 5}) == 10
+    assert cache.info() == (2, 1, 0, 2, 1)
+
+
+@pytest.mark.parametrize('source', ['y = x + 1', 'x * (y = 2)'])
+def test_declarations_bypass_the_cache(source):
+    f = expr.create_state().compile(source)
+    f.memoize()
+
+    assert not f.pure
+    f.evaluate({'x': 1})
+    f.evaluate({'x': 1})
+    assert f.cache.info() == (0, 0, 0, 128, 0)
+
+
+def test_impure_functions_bypass_the_cache():
+    counter = itertools.count()
+    state = expr.create_state(builtins={'tick': expr.impure(lambda d: d + next(counter))})
+
+    f = state.compile('tick(x)')
+    f.memoize()
+
+    assert not f.pure
+    assert [f.evaluate({'x': 1}) for _ in range(3)] == [1, 2, 3]
+    assert f.cache.info().misses == 0
+
+
+def test_precision_is_part_of_the_key():
+    f = expr.create_state().compile('1 / x')
+    f.memoize()
+
+    with localcontext() as ctx:
+        ctx.prec = 5
+        assert f.evaluate({'x': 3}) == Decimal('0.33333')
+
+    assert f.evaluate({'x': 3}) == Decimal(1) / 3
+    assert f.cache.info().misses == 2
+
+
+def test_redeclared_parser_variables_change_the_key():
+    state = expr.create_state()
+    state.evaluate('a = 2')
+
+    f = state.compile('a * x')
+    f.memoize()
+    assert f.evaluate({'x': 5}) == 10
+
+    state.evaluate('a = 3')
+    assert f.evaluate({'x': 5}) == 15
+    assert f.cache.info() == (0, 2, 0, 128, 2)
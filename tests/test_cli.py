@@ -0,0 +1,65 @@
+import json
+
+from decimal import getcontext
+
+import pytest
+
+from expr.cli import main
+
+
+@pytest.fixture
+def run(tmp_path, capsys):
+    def runner(content, *args):
+        path = tmp_path / 'input'
+        path.write_text(content)
+
+        code = main([str(path), '--quiet', *args])
+        return code, capsys.readouterr().out.splitlines()
+
+    return runner
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_declarations_carry_over(run, jobs):
+    code, lines = run('x = 2\nx + 1\n\nx + 1\ny = x * 10\ny\n', '--jobs', jobs, '--chunksize', '1')
+    assert code == 0
+    assert lines == ['', '3', '3', '', '20']
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_bad_rows_do_not_stop_the_run(run, jobs):
+    code, lines = run('1 + 1\n(x = 1) + 1\n1/0\n2 + 2\n', '--jobs', jobs)
+    assert code == 1
+    assert lines[0] == '2'
+    assert lines[1]
+    assert lines[2] == '[ERROR] Cannot divide by zero'
+    assert lines[3] == '4'
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_formula_over_csv(run, jobs):
+    code, lines = run('x,y\n1,2\nabc,1\n3,0\n', '-f', 'x / y', '--format', 'jsonl', '--jobs', jobs)
+    rows = list(map(json.loads, lines))
+
+    assert code == 1
+    assert rows[0] == {'x': '1', 'y': '2', 'result': '0.5', 'error': None}
+    assert 'abc' in rows[1]['error']
+    assert rows[2]['error'] == '[ERROR] Cannot divide by zero'
+
+
+def test_missing_file(capsys):
+    with pytest.raises(SystemExit) as info:
+        main(['does-not-exist.txt'])
+
+    assert info.value.code == 2
+    assert "can't open 'does-not-exist.txt'" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_precision_is_local(run, jobs):
+    before = getcontext().prec
+    code, lines = run('1 / 3\n2 / 3\n', '--precision', '5', '--jobs', jobs)
+
+    assert code == 0
+    assert lines == ['0.33333', '0.66667']
+    assert getcontext().prec == before
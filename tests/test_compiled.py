@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import pytest
+
+import expr
+
+
+@pytest.fixture(params=[False, True], ids=['plain', 'interned'])
+def state(request):
+    return expr.create_state(intern=request.param)
+
+
+@pytest.mark.parametrize('source', [
+    '6 + 5 * 2',
+    '2^3^2',
+    '-2^2',
+    '4E-2',
+    '3!',
+    'sin(2)^2 + sin(2)*cos(2)',
+    'sqrt(16) + cbrt(27)',
+    '7 // 2 + 7 % 2',
+])
+def test_compile_matches_evaluate(state, source):
+    assert state.compile(source).evaluate() == state.evaluate(source)
+
+
+def test_common_subexpressions_share_slots(state):
+    f = state.compile('sin(x)^2 + sin(x)*cos(x)')
+    # x, sin(x), 2, ^, cos(x), *, +
+    assert len(f._program) == 7
+    assert f.evaluate({'x': 1}) == state.evaluate('sin(1)^2 + sin(1)*cos(1)')
+
+
+def test_interning_shares_nodes():
+    state = expr.create_state(intern=True)
+    a = state.compile('(x + 1) * (x + 1)')
+    b = state.compile('(x + 1) / 2')
+
+    assert a.root.children[0] is a.root.children[1]
+    assert a.root.children[0] is b.root.children[0]
+
+
+def test_batch_shares_work_across_expressions(state):
+    batch = expr.CompiledBatch(state.compile('sin(x) + 1'), state.compile('sin(x) * 2'))
+    assert len(batch._program) == 6
+    assert batch.evaluate({'x': 1}) == [
+        state.evaluate('sin(1) + 1'),
+        state.evaluate('sin(1) * 2'),
+    ]
+
+
+def test_batch_reads_after_assignment(state):
+    batch = expr.CompiledBatch(state.compile('x'), state.compile('x = 5'), state.compile('x + 0'))
+    assert batch.evaluate({'x': 1}) == [Decimal(1), None, Decimal(5)]
+
+
+def test_reads_after_assignment_within_expression(state):
+    state.evaluate('x = 1')
+    assert state.compile('x*(x = 5) + x').evaluate() == 10
+
+
+def test_repeated_assignments_all_happen(state):
+    batch = expr.CompiledBatch(*map(state.compile, ['x = 6', 'x = 5', 'x = 6', 'x']))
+    assert batch.evaluate()[-1] == 6
+
+
+def test_deep_expressions_do_not_recurse(state):
+    f = state.compile('+'.join(['x'] * 5000))
+    assert f.evaluate({'x': 1}) == 5000
+
+
+def test_guards_apply_upon_evaluation(state):
+    f = state.compile('x^y')
+    with pytest.raises(expr.ExponentOverflow):
+        f.evaluate({'x': 2, 'y': 1000})
+
+
+def test_casting_errors_are_not_overflows(state):
+    with pytest.raises(expr.CastingError) as info:
+        state.compile('x').evaluate({'x': 'abc'})
+    assert 'abc' in info.value.friendly
+
+
+def test_evaluating_while_compiling(state):
+    # Evaluate on the same parser part way through lexing an expression being compiled
+    lexer = state._build_lexer()
+    results = []
+
+    class Interleaved:
+        @staticmethod
+        def lex(source):
+            for token in lexer.lex(source):
+                if not results and source == 'x + y':
+                    results.append(state.evaluate('pi - 1'))
+                yield token
+
+    state.__lexer__ = Interleaved
+    f = state.compile('x + y')
+
+    assert results == [expr.builtin.pi - 1]
+    assert f.evaluate({'x': 1, 'y': 2}) == 3
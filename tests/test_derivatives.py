@@ -0,0 +1,133 @@
+import math
+import random
+
+from decimal import Decimal, localcontext
+
+import pytest
+
+import expr
+
+
+state = expr.create_state()
+
+# Builtins computed in hardware floats are only checked as precisely as floats allow
+float_builtins = {'tan', 'asin', 'acos', 'atan', 'log'}
+
+
+def central_difference(f, variables, name, h):
+    with localcontext() as ctx:
+        ctx.prec = 50
+        above, below = dict(variables), dict(variables)
+        above[name] += h
+        below[name] -= h
+        return (f.evaluate(above) - f.evaluate(below)) / (2 * h)
+
+
+@pytest.mark.parametrize('source', [
+    'x*y + x^2',
+    'x/y - y',
+    'x^y',
+    '(0 - x)^3',
+    'sin(x)*cos(y)',
+    'sin(x)^2 + sin(x)*cos(x)',
+    'ln(x) + sqrt(y)',
+    'log10(x*y)',
+    'cbrt(x*y)',
+    'x % y + (0 - x) % y',
+    'x // y + 3!',
+    'x*pi',
+    'sum({x, y, x*y})',
+    'prod({x, y, 3})',
+    'mean({x, y})',
+    'max({x, y}) - min({x, 2y})',
+    'tan(x) + atan(y)',
+    'asin(x/10) + acos(y/10)',
+    'log(x) + atan(y)',
+])
+def test_matches_central_differences(source):
+    f = state.compile(source)
+    inexact = any(name in source for name in float_builtins)
+    h, tolerance = (Decimal('1e-6'), Decimal('1e-6')) if inexact else (Decimal('1e-15'), Decimal('1e-12'))
+
+    rng = random.Random(source)
+    for _ in range(20):
+        variables = {'x': Decimal(str(rng.uniform(0.2, 4))), 'y': Decimal(str(rng.uniform(0.2, 4)))}
+        value, partials = f.evaluate_with_derivatives(variables)
+
+        assert value == f.evaluate(variables)
+        for name, partial in partials.items():
+            expected = central_difference(f, variables, name, h)
+            assert abs(partial - expected) <= tolerance * max(1, abs(expected)), (source, variables, name)
+
+
+@pytest.mark.parametrize('source, point, expected', [
+    ('x^1', 0, 1),
+    ('x^2', 0, 0),
+    ('x^3', 0, 0),
+    ('x^0', 2, 0),
+    ('2^x', 0, Decimal(2).ln()),
+])
+def test_powers_at_zero(source, point, expected):
+    assert state.compile(source).gradient({'x': point}) == {'x': expected}
+
+
+def test_power_of_zero_by_exponent():
+    assert state.compile('x^y').gradient({'x': 0, 'y': 2}) == {'x': 0, 'y': 0}
+
+
+def test_wrt_defaults_to_names_read():
+    f = state.compile('x*y*z')
+    assert f.gradient({'x': 1, 'y': 2, 'z': 3}) == {'x': 6, 'y': 3, 'z': 2}
+    assert f.gradient({'x': 1, 'y': 2, 'z': 3}, wrt=['y']) == {'y': 3}
+    assert state.compile('5').evaluate_with_derivatives({'x': 1}) == (5, {})
+    assert state.compile('5').evaluate_with_derivatives({'x': 1}, wrt=['x']) == (5, {'x': 0})
+
+
+def test_many_points():
+    f = state.compile('x^2 * y + sin(y)')
+    points = [{'x': 1, 'y': 0}, {'x': 2, 'y': 0}]
+    assert f.gradients(points) == [f.evaluate_with_derivatives(point) for point in points]
+    assert f.gradients(points, cls=float) == [(0.0, {'x': 0.0, 'y': 2.0}), (0.0, {'x': 0.0, 'y': 5.0})]
+    assert f.gradients(iter(points), wrt=iter(['y'])) == [(0, {'y': 2}), (0, {'y': 5})]
+
+
+def test_radians():
+    # Central differences of a function computed in floats can't be this precise
+    partial = state.compile('rad(x)').gradient({'x': 2})['x']
+    assert abs(partial - Decimal(math.pi) / 180) <= Decimal('1e-15') * partial
+
+
+def test_fractional_powers_of_zero():
+    for source in ['sqrt(x)', 'x^0.5', 'x^(0-0.5)']:
+        with pytest.raises(expr.DivisionByZero):
+            state.compile(source).gradient({'x': 0})
+
+
+def test_custom_functions():
+    missing = expr.create_state(builtins={'f': lambda d: d * 2})
+    with pytest.raises(expr.NotDifferentiable):
+        missing.compile('f(x)').gradient({'x': 1})
+
+    given = expr.create_state(builtins={'f': lambda d: d * 2}, derivatives={'f': lambda d: Decimal(2)})
+    assert given.compile('f(x)^2').gradient({'x': 3}) == {'x': 24}
+
+
+def test_custom_aggregates():
+    def sum_of_squares(values):
+        return sum(v * v for v in values)
+
+    missing = expr.create_state(aggregates={'sq': sum_of_squares})
+    with pytest.raises(expr.NotDifferentiable):
+        missing.compile('sq({x, y})').gradient({'x': 1, 'y': 2})
+
+    given = expr.create_state(
+        aggregates={'sq': sum_of_squares},
+        aggregate_derivatives={'sq': lambda values, result: [2 * v for v in values]}
+    )
+    assert given.compile('sq({x, y, x})').gradient({'x': 1, 'y': 2}) == {'x': 4, 'y': 4}
+
+
+def test_interned_expressions():
+    interned = expr.create_state(intern=True)
+    f = interned.compile('sin(x) * sin(x)')
+    assert f.gradient({'x': 1}) == state.compile('sin(x) * sin(x)').gradient({'x': 1})